@@ -1,21 +1,34 @@
-arr = [1]
-nums = sorted(arr)
-
-# Check if the array is already sorted
-if arr == nums:
-    print(0)
-else:
-    # Find the first index where elements differ
-    for i in range(len(arr)):
-        if arr[i] != nums[i]:
-            small = i
-            break
-
-    # Find the last index where elements differ
-    for j in range(len(arr)-1, -1, -1):
-        if arr[j] != nums[j]:
-            large = j
-            break
-
-    # Calculate the length of the unsorted subarray
-    print(large - small + 1)
+import numpy as np
+
+
+def find_unsorted_range(arr, nums):
+    # Mark every index where the array differs from its sorted copy
+    mask = arr != nums
+
+    # Already sorted: there is no unsorted range
+    if not mask.any():
+        return -1, -1
+
+    # argmax returns the first True, on the reversed mask the last one
+    small = int(mask.argmax())
+    large = len(arr) - 1 - int(mask[::-1].argmax())
+
+    return small, large
+
+
+def main():
+    arr = np.asarray([1])
+    nums = np.sort(arr)
+
+    # Check if the array is already sorted
+    if np.array_equal(arr, nums):
+        print(0)
+    else:
+        small, large = find_unsorted_range(arr, nums)
+
+        # Calculate the length of the unsorted subarray
+        print(large - small + 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,32 @@
 import time
 import ast
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import io
-import base64
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, url_for
 import sys
-from functools import wraps
 import platform
-import psutil
 import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
+import orjson
 from visualizer import CodeVisualizer
 from tree_visualizer import TreeVisualizer
 from memory_visualizer import MemoryVisualizer
+from code_cache import cache_on_source, get_cached_source
+from measurement import measure_execution
 
 app = Flask(__name__)
 
+# The visualizers keep no per-request state, so one instance serves all requests
+code_visualizer = CodeVisualizer()
+tree_visualizer = TreeVisualizer()
+memory_visualizer = MemoryVisualizer()
+
 # Create saved_code directory if it doesn't exist
 if not os.path.exists('saved_code'):
     os.makedirs('saved_code')
@@ -42,33 +52,93 @@ safe_builtins = {
     'enumerate': enumerate
 }
 
-def measure_time(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        return result, end_time - start_time
-    return wrapper
+# Shared across requests so worker threads (and their plot figures) are reused
+analysis_executor = ThreadPoolExecutor(max_workers=3)
 
-def get_memory_usage():
-    """Get current memory usage in MB, cross-platform"""
-    process = psutil.Process(os.getpid())
-    return process.memory_info().rss / 1024 / 1024  # Bytes to MB
+class ComplexityVisitor(ast.NodeVisitor):
+    """Single-pass AST visitor collecting the counters used by analyze_complexity"""
+    
+    def __init__(self):
+        self.loop_depth = 0
+        self.max_loop_depth = 0
+        self.function_names = set()
+        self.name_calls = {}
+        self.function_calls = {}
+        self.data_structures = {}
+    
+    def visit_FunctionDef(self, node):
+        self.function_names.add(node.name)
+        self.generic_visit(node)
+    
+    def _visit_loop(self, node):
+        self.loop_depth += 1
+        self.max_loop_depth = max(self.max_loop_depth, self.loop_depth)
+        self.generic_visit(node)
+        self.loop_depth -= 1
+    
+    visit_For = _visit_loop
+    visit_While = _visit_loop
+    
+    def visit_Call(self, node):
+        # Track function calls for complexity analysis
+        func_name = "unknown"
+        func_type = type(node.func)
+        if func_type is ast.Name:
+            func_name = node.func.id
+            self.name_calls[func_name] = self.name_calls.get(func_name, 0) + 1
+        elif func_type is ast.Attribute:
+            func_name = node.func.attr
+        
+        self.function_calls[func_name] = self.function_calls.get(func_name, 0) + 1
+        self.generic_visit(node)
+    
+    def _count_structure(self, kind, node):
+        self.data_structures[kind] = self.data_structures.get(kind, 0) + 1
+        self.generic_visit(node)
+    
+    def visit_List(self, node):
+        self._count_structure('list', node)
+    
+    def visit_ListComp(self, node):
+        self._count_structure('list', node)
+    
+    def visit_Dict(self, node):
+        self._count_structure('dict', node)
+    
+    def visit_DictComp(self, node):
+        self._count_structure('dict', node)
+    
+    def visit_Set(self, node):
+        self._count_structure('set', node)
+    
+    def visit_SetComp(self, node):
+        self._count_structure('set', node)
+
+# Straight-line snippets made only of these statements, and containing none of
+# the nodes below, analyze to O(1) time and space
+SIMPLE_STATEMENTS = (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Expr)
+COMPLEXITY_NODES = (ast.For, ast.While, ast.Call, ast.List, ast.Dict, ast.Set,
+                    ast.ListComp, ast.DictComp, ast.SetComp)
+
+def contains_complexity_node(node):
+    """Check whether any descendant of node is one of COMPLEXITY_NODES"""
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, COMPLEXITY_NODES) or contains_complexity_node(child):
+            return True
+    return False
 
-def measure_memory(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_memory = get_memory_usage()
-        result = func(*args, **kwargs)
-        end_memory = get_memory_usage()
-        return result, end_memory - start_memory
-    return wrapper
+def is_trivial_code(tree):
+    """Check whether the full complexity analysis can be skipped"""
+    if not all(isinstance(stmt, SIMPLE_STATEMENTS) for stmt in tree.body):
+        return False
+    return not contains_complexity_node(tree)
 
-def analyze_complexity(code):
+# Results are cached per source, since edit-and-rerun often resubmits the same code
+@cache_on_source
+def analyze_complexity(source):
     """Analyze time and space complexity of Python code with improved accuracy"""
     try:
-        tree = ast.parse(code)
+        tree = source.tree
         analysis = {
             'time_complexity': 'O(1)',
             'space_complexity': 'O(1)',
@@ -76,52 +146,20 @@ def analyze_complexity(code):
             'recommendations': []
         }
         
-        # Track loop nesting and recursive calls
-        loop_stack = []
-        max_loop_depth = 0
-        recursive_calls = 0
-        data_structures = {}
-        function_calls = {}
+        # Fast path for straight-line code, which is O(1) in both time and space
+        if is_trivial_code(tree):
+            return analysis
         
-        # Get function names
-        function_names = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                function_names.append(node.name)
+        # Collect loop nesting, calls and data structures in one traversal
+        visitor = ComplexityVisitor()
+        visitor.visit(tree)
+        max_loop_depth = visitor.max_loop_depth
+        data_structures = visitor.data_structures
+        function_calls = visitor.function_calls
         
-        # Analyze the AST
-        for node in ast.walk(tree):
-            # Track loops and their nesting
-            if isinstance(node, (ast.For, ast.While)):
-                loop_stack.append(node)
-                max_loop_depth = max(max_loop_depth, len(loop_stack))
-            elif isinstance(node, ast.Call):
-                # Check for recursive calls
-                if isinstance(node.func, ast.Name) and node.func.id in function_names:
-                    recursive_calls += 1
-                
-                # Track function calls for complexity analysis
-                func_name = "unknown"
-                if isinstance(node.func, ast.Name):
-                    func_name = node.func.id
-                elif isinstance(node.func, ast.Attribute):
-                    func_name = node.func.attr
-                
-                function_calls[func_name] = function_calls.get(func_name, 0) + 1
-            
-            # Count data structure usage
-            if isinstance(node, ast.List):
-                data_structures['list'] = data_structures.get('list', 0) + 1
-            elif isinstance(node, ast.Dict):
-                data_structures['dict'] = data_structures.get('dict', 0) + 1
-            elif isinstance(node, ast.Set):
-                data_structures['set'] = data_structures.get('set', 0) + 1
-            elif isinstance(node, ast.ListComp):
-                data_structures['list'] = data_structures.get('list', 0) + 1
-            elif isinstance(node, ast.DictComp):
-                data_structures['dict'] = data_structures.get('dict', 0) + 1
-            elif isinstance(node, ast.SetComp):
-                data_structures['set'] = data_structures.get('set', 0) + 1
+        # Calls to functions defined in the snippet count as recursive
+        recursive_calls = sum(count for name, count in visitor.name_calls.items()
+                              if name in visitor.function_names)
         
         # Determine time complexity based on analysis
         if recursive_calls > 0:
@@ -165,7 +203,8 @@ def analyze_complexity(code):
 
 def generate_optimization_recommendations(analysis, exec_time, memory_used):
     """Generate recommendations based on code analysis and performance metrics"""
-    recommendations = analysis['recommendations']
+    # Copy, as the analysis may be a cached result shared between requests
+    recommendations = list(analysis['recommendations'])
     
     if exec_time > 1.0:
         recommendations.append("Your code is running slowly. Consider optimizing algorithms.")
@@ -179,32 +218,71 @@ def generate_optimization_recommendations(analysis, exec_time, memory_used):
     
     return recommendations
 
+# Rendered plots served by /analyze/plot.png, oldest first
+MAX_STORED_PLOTS = 64
+plot_store = OrderedDict()
+plot_store_lock = threading.Lock()
+
+# Each thread reuses one Agg figure instead of going through pyplot per request
+plot_figures = threading.local()
+
+def get_plot_figure():
+    """Return this thread's performance figure, cleared for redrawing"""
+    fig = getattr(plot_figures, 'figure', None)
+    if fig is None:
+        fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(fig)
+        plot_figures.figure = fig
+    else:
+        fig.clear()
+    return fig
+
 def create_performance_plot(time_data, memory_data):
     """Create a performance visualization plot"""
-    plt.figure(figsize=(10, 5))
+    fig = get_plot_figure()
+    time_ax, memory_ax = fig.subplots(1, 2)
     
-    plt.subplot(1, 2, 1)
-    plt.bar(['Execution Time'], [time_data], color='blue')
-    plt.ylabel('Seconds')
-    plt.title('Execution Time')
+    time_ax.bar(['Execution Time'], [time_data], color='blue')
+    time_ax.set_ylabel('Seconds')
+    time_ax.set_title('Execution Time')
     
-    plt.subplot(1, 2, 2)
-    plt.bar(['Memory Used'], [memory_data], color='green')
-    plt.ylabel('MB')
-    plt.title('Memory Usage')
+    memory_ax.bar(['Memory Used'], [memory_data], color='green')
+    memory_ax.set_ylabel('MB')
+    memory_ax.set_title('Memory Usage')
     
-    plt.tight_layout()
+    fig.tight_layout()
     
     # Save plot to a bytes buffer
     buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    
-    # Encode the image to base64
-    image_base64 = base64.b64encode(buf.read()).decode('utf-8')
+    fig.canvas.print_png(buf)
+    png_bytes = buf.getvalue()
     buf.close()
     
-    return image_base64
+    return png_bytes
+
+def store_plot(png_bytes):
+    """Keep a rendered plot until the browser fetches it and return its nonce"""
+    nonce = uuid.uuid4().hex
+    with plot_store_lock:
+        plot_store[nonce] = png_bytes
+        # Drop the oldest plots once the store is full
+        while len(plot_store) > MAX_STORED_PLOTS:
+            plot_store.popitem(last=False)
+    return nonce
+
+@cache_on_source
+def generate_ast_tree(source):
+    """Generate the AST tree visualization, cached per source"""
+    return tree_visualizer.generate_ast_tree(source.tree)
+
+def json_response(payload):
+    """Serialize a response with orjson, which is much faster than jsonify on large payloads"""
+    try:
+        return app.response_class(orjson.dumps(payload), mimetype='application/json')
+    except orjson.JSONEncodeError:
+        # orjson rejects nesting deeper than 255 levels and strings with lone
+        # surrogates, both of which jsonify still handles
+        return jsonify(payload)
 
 @app.route('/')
 def index():
@@ -215,50 +293,62 @@ def analyze_code():
     data = request.json
     code = data.get('code', '')
     
-    # Create a safe execution environment
-    local_vars = {}
-    output_capture = io.StringIO()
-    
-    # Add output capture to builtins
-    execution_env = safe_builtins.copy()
-    execution_env['print'] = lambda *args, **kwargs: print(*args, **kwargs, file=output_capture)
-    
     try:
-        # Measure execution time
-        exec_wrapped = measure_time(exec)
-        result, exec_time = exec_wrapped(code, execution_env, local_vars)
+        # One cache entry holds the tree and code objects used by every step below
+        source = get_cached_source(code)
+        compiled_code = source.compiled_code
+        instrumented_code = source.instrumented_code
+        
+        # The static analyses do not depend on running the code, so they run
+        # concurrently with the runs below, as does the plot once timings are known
+        tree_future = analysis_executor.submit(generate_ast_tree, source)
+        complexity_future = analysis_executor.submit(analyze_complexity, source)
         
-        # Measure memory usage
-        mem_wrapped = measure_memory(exec)
-        result, memory_used = mem_wrapped(code, execution_env, local_vars)
+        # Measure execution time and peak Python memory on an untraced run in a
+        # child process, so the figures reflect the user's code alone
+        exec_time, peak_memory, output = measure_execution(compiled_code, safe_builtins)
+        memory_used = peak_memory / 1024 / 1024  # Bytes to MB
+        plot_future = analysis_executor.submit(create_performance_plot, exec_time, memory_used)
         
-        # Get captured output
-        output = output_capture.getvalue()
+        # A second, instrumented run drives both the execution and memory visualizers
+        steps = []
+        snapshots = []
+        variables = {}
+        
+        def trace_line(line_no):
+            code_visualizer.trace_line(steps, line_no)
+            memory_visualizer.take_snapshot(snapshots, variables, line_no)
+        
+        def trace_var(var_name, value):
+            code_visualizer.trace_var(steps, var_name, value)
+            memory_visualizer.record_memory(variables, var_name, value)
+        
+        # Output was already captured by the measured run
+        visualizer_env = safe_builtins.copy()
+        visualizer_env['print'] = lambda *args, **kwargs: None
+        visualizer_env['__trace_line__'] = trace_line
+        visualizer_env['__trace_var__'] = trace_var
+        exec(instrumented_code, visualizer_env)
+        
+        memory_visualizer.take_final_snapshot(snapshots, variables, code)
+        execution_steps = code_visualizer.format_steps(steps)
+        memory_map = memory_visualizer.format_memory_snapshots(snapshots)
         
         # Analyze code complexity
-        complexity_analysis = analyze_complexity(code)
+        complexity_analysis = complexity_future.result()
         
         # Generate recommendations
         recommendations = generate_optimization_recommendations(
             complexity_analysis, exec_time, memory_used
         )
         
-        # Create performance visualization
-        plot_image = create_performance_plot(exec_time, memory_used)
-        
-        # Generate execution visualization
-        visualizer = CodeVisualizer()
-        execution_steps = visualizer.visualize_execution(code, execution_env.copy())
+        # Create performance visualization, served separately as raw PNG
+        plot_nonce = store_plot(plot_future.result())
         
         # Generate AST tree visualization
-        tree_visualizer = TreeVisualizer()
-        ast_tree = tree_visualizer.generate_ast_tree(code)
+        ast_tree = tree_future.result()
         
-        # Generate memory visualization
-        memory_visualizer = MemoryVisualizer()
-        memory_map = memory_visualizer.visualize_memory(code, execution_env.copy())
-        
-        return jsonify({
+        return json_response({
             'success': True,
             'execution_time': round(exec_time, 4),
             'memory_used': round(memory_used, 2),
@@ -266,15 +356,15 @@ def analyze_code():
             'space_complexity': complexity_analysis['space_complexity'],
             'issues': complexity_analysis['issues'],
             'recommendations': recommendations,
-            'performance_plot': plot_image,
+            'plot_url': url_for('performance_plot', nonce=plot_nonce),
             'output': output,
             'execution_steps': execution_steps,
             'ast_tree': ast_tree,
             'memory_map': memory_map
         })
-        
+    
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': str(e),
             'execution_time': 0,
@@ -283,14 +373,26 @@ def analyze_code():
             'space_complexity': 'Unknown',
             'issues': [f'Execution error: {str(e)}'],
             'recommendations': ['Fix runtime errors in your code'],
-            'performance_plot': None,
+            'plot_url': None,
             'output': None,
             'execution_steps': [],
             'ast_tree': [],
             'memory_map': []
         })
-    finally:
-        output_capture.close()
+
+@app.route('/analyze/plot.png')
+def performance_plot():
+    nonce = request.args.get('nonce', '')
+    with plot_store_lock:
+        png_bytes = plot_store.get(nonce)
+    
+    if png_bytes is None:
+        return jsonify({
+            'success': False,
+            'error': 'Plot not found'
+        }), 404
+    
+    return send_file(io.BytesIO(png_bytes), mimetype='image/png')
 
 @app.route('/save_code', methods=['POST'])
 def save_code():
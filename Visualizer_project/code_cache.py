@@ -0,0 +1,94 @@
+import ast
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from instrumenter import Instrumenter
+
+# Least recently used sources are evicted beyond either limit. Each cached
+# character costs about 110 bytes once the tree, code objects and AST tree
+# payload are built, so the character limit keeps the cache near 55 MB
+MAX_CACHED_SOURCES = 64
+MAX_CACHED_SOURCE_CHARS = 512 * 1024
+
+def source_digest(code):
+    """Return the SHA-256 hex digest of a source string"""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+class CachedSource:
+    """Parsed tree, compiled (plain and instrumented) code and analysis results of one source string"""
+    
+    def __init__(self, code):
+        self.code = code
+        self.results = {}
+        self._tree = None
+        self._compiled_code = None
+        self._instrumented_code = None
+    
+    @property
+    def tree(self):
+        # Parsed on first use
+        if self._tree is None:
+            self._tree = ast.parse(self.code, '<user>')
+        return self._tree
+    
+    @property
+    def compiled_code(self):
+        # Compiled on first use from the shared tree, which compile leaves unchanged
+        if self._compiled_code is None:
+            self._compiled_code = compile(self.tree, '<user>', 'exec')
+        return self._compiled_code
+    
+    @property
+    def instrumented_code(self):
+        # Compiled on first use; the transformer rewrites the tree in place,
+        # so it works on a fresh parse rather than the shared tree
+        if self._instrumented_code is None:
+            tree = Instrumenter().visit(ast.parse(self.code))
+            ast.fix_missing_locations(tree)
+            self._instrumented_code = compile(tree, '<instrumented>', 'exec')
+        return self._instrumented_code
+
+class SourceCache:
+    """LRU cache of CachedSource entries, bounded by entry count and total source length"""
+    
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.total_chars = 0
+        self.lock = threading.Lock()
+    
+    def get(self, code):
+        digest = source_digest(code)
+        with self.lock:
+            source = self.entries.get(digest)
+            if source is not None:
+                self.entries.move_to_end(digest)
+                return source
+            
+            source = CachedSource(code)
+            self.entries[digest] = source
+            self.total_chars += len(code)
+            # Evict the oldest entries, but always keep the new one
+            while len(self.entries) > 1 and (len(self.entries) > MAX_CACHED_SOURCES
+                                             or self.total_chars > MAX_CACHED_SOURCE_CHARS):
+                _, evicted = self.entries.popitem(last=False)
+                self.total_chars -= len(evicted.code)
+            return source
+
+source_cache = SourceCache()
+
+def get_cached_source(code):
+    """Return the cache entry for code, keyed by the SHA-256 digest of the source.
+
+    Analyses share the entry's tree, so callers must not modify it.
+    """
+    return source_cache.get(code)
+
+def cache_on_source(func):
+    """Cache func(source) on the CachedSource, so results are evicted along with it"""
+    @functools.wraps(func)
+    def wrapper(source):
+        if func.__name__ not in source.results:
+            source.results[func.__name__] = func(source)
+        return source.results[func.__name__]
+    return wrapper
@@ -0,0 +1,77 @@
+import ast
+
+class Instrumenter(ast.NodeTransformer):
+    """Insert tracing hooks around the statements of a module.
+
+    Every statement is preceded by ``__trace_line__(lineno)`` and every
+    assignment to plain names is followed by ``__trace_var__(name, name)``.
+    The hooks are looked up in the globals of the executing environment.
+    """
+
+    def visit(self, node):
+        # Expressions never contain statements, and deeply nested ones
+        # (such as long chains of +) would exhaust the recursion limit
+        if isinstance(node, ast.expr):
+            return node
+        return super().visit(node)
+
+    def generic_visit(self, node):
+        super().generic_visit(node)
+
+        # Statement lists live in body/orelse/finalbody of every compound node
+        for field in ('body', 'orelse', 'finalbody'):
+            stmts = getattr(node, field, None)
+            if isinstance(stmts, list) and stmts and isinstance(stmts[0], ast.stmt):
+                may_have_docstring = field == 'body' and isinstance(
+                    node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))
+                setattr(node, field, self._instrument_body(stmts, may_have_docstring))
+        return node
+
+    def _instrument_body(self, stmts, may_have_docstring=False):
+        body = []
+        for index, stmt in enumerate(stmts):
+            # A hook before the docstring would turn it into a plain expression
+            is_docstring = (may_have_docstring and index == 0 and isinstance(stmt, ast.Expr)
+                            and isinstance(stmt.value, ast.Constant)
+                            and isinstance(stmt.value.value, str))
+            # __future__ imports must stay at the top of the module
+            is_future_import = isinstance(stmt, ast.ImportFrom) and stmt.module == '__future__'
+            if not (is_docstring or is_future_import):
+                body.append(self._hook(stmt, '__trace_line__', ast.Constant(stmt.lineno)))
+
+            body.append(stmt)
+
+            for name in self._assigned_names(stmt):
+                body.append(self._hook(stmt, '__trace_var__',
+                                       ast.Constant(name), ast.Name(name, ast.Load())))
+        return body
+
+    def _hook(self, stmt, hook_name, *args):
+        call = ast.Call(ast.Name(hook_name, ast.Load()), list(args), [])
+        return ast.copy_location(ast.Expr(call), stmt)
+
+    def _assigned_names(self, stmt):
+        if isinstance(stmt, ast.Assign):
+            targets = stmt.targets
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            targets = [stmt.target]
+        elif isinstance(stmt, ast.AugAssign):
+            targets = [stmt.target]
+        else:
+            return []
+
+        names = []
+        for target in targets:
+            self._collect_names(target, names)
+        return names
+
+    def _collect_names(self, target, names):
+        # Attribute and subscript targets are skipped, as they are not variables
+        if isinstance(target, ast.Name):
+            if target.id not in names:
+                names.append(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._collect_names(elt, names)
+        elif isinstance(target, ast.Starred):
+            self._collect_names(target.value, names)
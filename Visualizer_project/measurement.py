@@ -0,0 +1,66 @@
+import io
+import marshal
+import multiprocessing
+import time
+import tracemalloc
+
+# A measured run still going after this long is killed
+MEASUREMENT_TIMEOUT_SECONDS = 10
+
+# forkserver starts each child from a clean single-threaded server process
+# rather than forking the threaded Flask process; Windows only has spawn
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    mp_context = multiprocessing.get_context('forkserver')
+else:
+    mp_context = multiprocessing.get_context('spawn')
+
+def _run_measured(code_bytes, builtins, conn):
+    """Execute the code in this (child) process and send back time, peak memory and output"""
+    output_capture = io.StringIO()
+    execution_env = dict(builtins)
+    execution_env['print'] = lambda *args, **kwargs: print(*args, **kwargs, file=output_capture)
+
+    try:
+        compiled_code = marshal.loads(code_bytes)
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        exec(compiled_code, execution_env)
+        exec_time = time.perf_counter() - start_time
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        conn.send((None, exec_time, peak_memory, output_capture.getvalue()))
+    except Exception as e:
+        conn.send((str(e), 0, 0, None))
+    finally:
+        conn.close()
+
+def measure_execution(compiled_code, builtins):
+    """Run compiled code in a child process and return (exec_time, peak_memory, output).
+
+    tracemalloc traces one process, so the peak covers the user's code alone and
+    not other requests served meanwhile. A run that does not finish within
+    MEASUREMENT_TIMEOUT_SECONDS is killed and raises TimeoutError.
+    """
+    parent_conn, child_conn = mp_context.Pipe(duplex=False)
+    process = mp_context.Process(target=_run_measured,
+                                 args=(marshal.dumps(compiled_code), builtins, child_conn),
+                                 daemon=True)
+    process.start()
+    child_conn.close()
+
+    try:
+        if not parent_conn.poll(MEASUREMENT_TIMEOUT_SECONDS):
+            raise TimeoutError(f'Execution timed out after {MEASUREMENT_TIMEOUT_SECONDS} seconds')
+        try:
+            error, exec_time, peak_memory, output = parent_conn.recv()
+        except EOFError:
+            # The child exited without reporting, e.g. on SystemExit
+            raise RuntimeError('Execution stopped before finishing') from None
+    finally:
+        parent_conn.close()
+        process.kill()
+        process.join()
+
+    if error is not None:
+        raise RuntimeError(error)
+    return exec_time, peak_memory, output
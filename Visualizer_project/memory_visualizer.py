@@ -3,29 +3,10 @@ import sys
 from collections import defaultdict
 
 class MemoryVisualizer:
-    def __init__(self):
-        self.memory_snapshots = []
-        self.current_snapshot = {}
+    """Stateless memory tracer; snapshots are kept in accumulators owned by the caller"""
     
-    def visualize_memory(self, code, execution_env):
-        """Visualize memory usage during code execution"""
-        try:
-            # Instrument the code to track memory changes
-            instrumented_code = self._instrument_code(code)
-            
-            # Add memory tracking to execution environment
-            execution_env['__memory_tracker__'] = self
-            execution_env['__record_memory__'] = self.record_memory
-            
-            # Execute the instrumented code
-            exec(instrumented_code, execution_env)
-            
-            return self.format_memory_snapshots()
-        except Exception as e:
-            return [f"Memory visualization error: {str(e)}"]
-    
-    def record_memory(self, var_name, value):
-        """Record a memory snapshot for a variable"""
+    def record_memory(self, variables, var_name, value):
+        """Record the current memory state of a variable"""
         # Get memory address
         mem_address = id(value)
         
@@ -44,60 +25,31 @@ class MemoryVisualizer:
         else:
             formatted_value = f"<{var_type} object>"
         
-        # Record the snapshot
-        self.current_snapshot[var_name] = {
+        # Record the variable state
+        variables[var_name] = {
             'address': mem_address,
             'type': var_type,
             'size': var_size,
             'value': formatted_value
         }
     
-    def take_snapshot(self, line_no):
+    def take_snapshot(self, snapshots, variables, line_no):
         """Take a memory snapshot at a specific line"""
         snapshot = {
             'line': line_no,
-            'variables': dict(self.current_snapshot)
+            'variables': dict(variables)
         }
-        self.memory_snapshots.append(snapshot)
+        snapshots.append(snapshot)
     
-    def _instrument_code(self, code):
-        """Instrument code to track memory usage"""
-        lines = code.split('\n')
-        instrumented_lines = []
-        line_no = 1
-        
-        for line in lines:
-            if line.strip() and not line.strip().startswith('#'):
-                # Add memory snapshot before executing the line
-                instrumented_lines.append(f'__memory_tracker__.take_snapshot({line_no})')
-                
-                # Add variable assignment tracking
-                if '=' in line and not line.strip().startswith('def '):
-                    parts = line.split('=')
-                    if len(parts) >= 2:
-                        var_name = parts[0].strip()
-                        # Skip function definitions and complex assignments
-                        if not any(c in var_name for c in '([{') and not line.strip().startswith('def '):
-                            instrumented_lines.append(f'__record_memory__("{var_name}", {var_name})')
-                
-                # Add the original line
-                instrumented_lines.append(line)
-            else:
-                # Keep comments and empty lines as is
-                instrumented_lines.append(line)
-            
-            line_no += 1
-        
-        # Add final snapshot
-        instrumented_lines.append(f'__memory_tracker__.take_snapshot({line_no})')
-        
-        return '\n'.join(instrumented_lines)
+    def take_final_snapshot(self, snapshots, variables, code):
+        """Take the snapshot following the last line of code"""
+        self.take_snapshot(snapshots, variables, len(code.split('\n')) + 1)
     
-    def format_memory_snapshots(self):
+    def format_memory_snapshots(self, snapshots):
         """Format memory snapshots for display"""
         formatted = []
         
-        for i, snapshot in enumerate(self.memory_snapshots):
+        for i, snapshot in enumerate(snapshots):
             formatted.append(f"Snapshot at line {snapshot['line']}:")
             
             if not snapshot['variables']:
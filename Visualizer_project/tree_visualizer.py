@@ -2,71 +2,97 @@ import ast
 import json
 
 class TreeVisualizer:
-    def __init__(self):
-        self.node_id = 0
+    """Stateless AST tree builder; node ids are local to each call"""
     
-    def generate_ast_tree(self, code):
-        """Generate a tree representation of the AST"""
+    def generate_ast_tree(self, tree):
+        """Generate a tree representation of a parsed AST"""
         try:
-            tree = ast.parse(code)
             ast_tree = self._parse_ast_node(tree)
             return ast_tree
         except Exception as e:
             return [f"AST parsing error: {str(e)}"]
     
     def _parse_ast_node(self, node, depth=0):
-        """Recursively parse AST node into a tree structure"""
+        """Parse AST node into a tree structure, iteratively with an explicit stack"""
         if not isinstance(node, ast.AST):
             return {
-                'id': self.node_id,
+                'id': 0,
                 'type': 'Literal',
                 'value': str(node),
                 'depth': depth,
                 'children': []
             }
         
-        self.node_id += 1
-        node_id = self.node_id
+        root_info = None
+        node_id = 0
+        # Entries are (node, depth, field in the parent, parent's children list)
+        stack = [(node, depth, None, None)]
         
-        node_info = {
-            'id': node_id,
-            'type': type(node).__name__,
-            'depth': depth,
-            'children': []
-        }
-        
-        # Add line number if available
-        if hasattr(node, 'lineno') and node.lineno:
-            node_info['lineno'] = node.lineno
-        
-        # Add specific attributes based on node type
-        if isinstance(node, ast.Name):
-            node_info['name'] = node.id
-        elif isinstance(node, ast.FunctionDef):
-            node_info['name'] = node.name
-        elif isinstance(node, ast.Call):
-            if isinstance(node.func, ast.Name):
-                node_info['func'] = node.func.id
-        elif isinstance(node, ast.Assign):
-            if len(node.targets) > 0 and isinstance(node.targets[0], ast.Name):
-                node_info['target'] = node.targets[0].id
-        elif isinstance(node, ast.Constant):
-            node_info['value'] = repr(node.value)
+        while stack:
+            node, depth, field_name, siblings = stack.pop()
+            node_id += 1
+            
+            # One pass over the fields collects both the child nodes and the
+            # scalar fields (names, operators' values, constants)
+            attrs = {}
+            children = []
+            for field in node._fields:
+                value = getattr(node, field, None)
+                if isinstance(value, ast.AST):
+                    children.append((field, value))
+                elif isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, ast.AST):
+                            children.append((field, item))
+                elif value is not None:
+                    attrs[field] = self._json_safe(value)
+            
+            node_info = {
+                'id': node_id,
+                'type': type(node).__name__,
+                'depth': depth,
+                'attrs': attrs,
+                'children': []
+            }
+            
+            # Add line number if available
+            lineno = getattr(node, 'lineno', None)
+            if lineno:
+                node_info['lineno'] = lineno
+            
+            # Record which field of the parent holds this node
+            if field_name is not None:
+                node_info['field'] = field_name
+            
+            # Push children in reverse so they are processed in source order
+            child_infos = node_info['children']
+            for field, child in reversed(children):
+                stack.append((child, depth + 1, field, child_infos))
+            
+            if siblings is None:
+                root_info = node_info
+            else:
+                siblings.append(node_info)
         
-        # Recursively process child nodes
-        for field, value in ast.iter_fields(node):
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, ast.AST):
-                        child_node = self._parse_ast_node(item, depth + 1)
-                        child_node['field'] = field
-                        node_info['children'].append(child_node)
-            elif isinstance(value, ast.AST):
-                child_node = self._parse_ast_node(value, depth + 1)
-                child_node['field'] = field
-                node_info['children'].append(child_node)
+        return root_info
+    
+    def _json_safe(self, value):
+        """Return value, or its repr if it cannot be serialized as JSON"""
+        # Strings with lone surrogates (e.g. "\ud800") are not valid UTF-8
+        if isinstance(value, str):
+            if value.isascii():
+                return value
+            try:
+                value.encode('utf-8')
+            except UnicodeEncodeError:
+                return repr(value)
+            return value
         
-        return node_info
+        # Bytes, complex numbers, Ellipsis and integers beyond 64 bits are not JSON serializable
+        if not isinstance(value, (str, int, float, bool)) or (
+                isinstance(value, int) and not -2 ** 63 <= value < 2 ** 64):
+            return repr(value)
+        return value
     
     def format_ast_tree(self, ast_tree):
         """Format the AST tree for display"""
@@ -84,15 +110,10 @@ class TreeVisualizer:
         
         node_line = f"{indent}└── {node['type']}"
         
-        # Add specific info based on node type
-        if 'name' in node:
-            node_line += f" ({node['name']})"
-        elif 'func' in node:
-            node_line += f" (call: {node['func']})"
-        elif 'target' in node:
-            node_line += f" (assign to: {node['target']})"
-        elif 'value' in node:
-            node_line += f" (value: {node['value']})"
+        # Add the node's scalar attributes
+        if node.get('attrs'):
+            attrs = ", ".join(f"{field}: {value!r}" for field, value in node['attrs'].items())
+            node_line += f" ({attrs})"
         
         # Add line number if available
         if 'lineno' in node: